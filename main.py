@@ -1,16 +1,90 @@
 import os
+import time
+import logging
+import asyncio
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 import base64
-import requests
+import httpx
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 
 from database import db, create_document, get_documents
-from schemas import Workspace, Page, PageUpdate, GitConnect, GitRepoSelect, GitSyncPage, GitPullPage, SearchQuery, LockPayload
+from schemas import Workspace, Page, PageUpdate, GitConnect, GitRepoSelect, GitSyncPage, GitSyncPages, GitPullPage, GitPullPages, PageBulkUpdate, SearchQuery, LockPayload
+
+logger = logging.getLogger(__name__)
+
+# Case-insensitive collation shared by the prefix indexes and the queries that use them
+CI_COLLATION = {"locale": "en", "strength": 2}
+# Upper bound on user search input; neither search path builds a regex from it
+SEARCH_MAX_LEN = 128
+# Fields needed to render page lists; omits the (potentially large) content body
+PAGE_LIST_PROJECTION = {"title": 1, "folder_path": 1, "tags": 1, "workspace_id": 1, "git_path": 1, "lock": 1}
+# Stop spending GitHub quota once a token is this close to its hourly limit
+GH_RATE_LIMIT_FLOOR = 50
+# Revalidation entries in gh_cache are dropped after this long without use
+GH_CACHE_EXPIRE_SECONDS = 24 * 3600
+# Redis TTL for cached repo lists and commit history
+GH_CACHE_TTL = 60
+# Number of /user/repos pages requested concurrently per round
+GH_REPO_PAGE_WINDOW = 4
+# Above this size base64 work moves to a thread so it doesn't stall the event loop
+B64_THREAD_THRESHOLD = 64 * 1024
+
+# Shared GitHub API client so TCP/TLS connections are reused across requests
+gh_client = httpx.AsyncClient(
+    base_url="https://api.github.com",
+    http2=True,
+    timeout=20,
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+)
+
+
+async def ensure_indexes():
+    # Trailing _id lets keyset-paginated page lists walk the index in order
+    await db["page"].create_index([("workspace_id", 1), ("_id", 1)])
+    await db["page"].create_index([("workspace_id", 1), ("folder_path", 1), ("_id", 1)])
+    await db["page"].create_index([("title", "text"), ("content", "text"), ("tags", "text")])
+    await db["page"].create_index([("workspace_id", 1), ("title", 1)], collation=CI_COLLATION)
+    await db["page"].create_index([("workspace_id", 1), ("tags", 1)], collation=CI_COLLATION)
+    await db["gh_cache"].create_index("key", unique=True)
+    await db["gh_cache"].create_index("fetched_at", expireAfterSeconds=GH_CACHE_EXPIRE_SECONDS)
+
+
+# Optional Redis cache for read-heavy GitHub endpoints (disabled without REDIS_URL)
+redis_url = os.getenv("REDIS_URL")
+# Short timeouts so a slow Redis degrades to a cache miss instead of stalling requests
+redis_client = redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1) if redis_url else None
+
+# The Contents API rejects concurrent writes to one branch, so PUTs are
+# serialized per (owner/repo, branch) within the process. Locks are never
+# evicted; this stays small as it holds one entry per repo/branch that
+# workspaces sync to
+gh_branch_locks = defaultdict(asyncio.Lock)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if db is not None:
+        await ensure_indexes()
+    yield
+    await gh_client.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +92,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Utilities
@@ -29,30 +104,173 @@ def to_object_id(id_str: str) -> ObjectId:
         raise HTTPException(status_code=400, detail="Invalid id")
 
 
-def serialize(doc):
+def serialize_page(doc):
+    if not doc:
+        return doc
+    doc["id"] = str(doc.pop("_id"))
+    if "workspace_id" in doc:
+        doc["workspace_id"] = str(doc["workspace_id"])
+    return doc
+
+
+def serialize_workspace(doc):
     if not doc:
         return doc
     doc["id"] = str(doc.pop("_id"))
     # Hide sensitive token if present
     if "gh_access_token" in doc:
-        doc["gh_connected"] = bool(doc.get("gh_access_token"))
-        doc.pop("gh_access_token", None)
+        doc["gh_connected"] = bool(doc.pop("gh_access_token"))
     return doc
 
 
+@lru_cache(maxsize=128)
+def gh_headers(token: str) -> MappingProxyType:
+    # Shared per token, so read-only; copy with dict() to add headers
+    return MappingProxyType({"Authorization": f"token {token}", "Accept": "application/vnd.github+json"})
+
+
+def after_filter(after: Optional[str]) -> dict:
+    return {"_id": {"$gt": to_object_id(after)}} if after else {}
+
+
+def set_next_cursor(response: Response, items: list, limit: int):
+    # Cursor is the last _id of a full page; clients pass it back as ?after=
+    if len(items) == limit:
+        response.headers["X-Next-Cursor"] = str(items[-1]["_id"])
+
+
+# Page joined with its workspace in one round-trip; returns (page, ws), either may be None
+async def find_page_with_workspace(page_id: str):
+    pipeline = [
+        {"$match": {"_id": to_object_id(page_id)}},
+        {"$lookup": {
+            "from": "workspace",
+            "localField": "workspace_id",
+            "foreignField": "_id",
+            "as": "ws",
+        }},
+        {"$unwind": {"path": "$ws", "preserveNullAndEmptyArrays": True}},
+    ]
+    docs = await db["page"].aggregate(pipeline).to_list(1)
+    if not docs:
+        return None, None
+    page = docs[0]
+    return page, page.pop("ws", None)
+
+
+# workspace_id -> (remaining, reset epoch seconds) from the last GitHub response
+gh_rate_limit = {}
+
+
+def gh_rate_limited(workspace_id: str) -> bool:
+    remaining, reset = gh_rate_limit.get(workspace_id, (GH_RATE_LIMIT_FLOOR, 0))
+    return remaining < GH_RATE_LIMIT_FLOOR and time.time() < reset
+
+
+# ETag-revalidated GitHub GET; returns (status, JSON body or error text), 304s served from gh_cache
+async def gh_get(workspace_id: str, path: str, headers: dict, params: Optional[dict] = None, allow_stale: bool = False):
+    key = f"{workspace_id}:{path}?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    prior = await db["gh_cache"].find_one({"key": key})
+    # Only read-only polls may skip GitHub; content that gets written back must revalidate
+    if allow_stale and prior and gh_rate_limited(workspace_id):
+        return 200, prior["body"]
+
+    req_headers = dict(headers)
+    if prior and prior.get("etag"):
+        req_headers["If-None-Match"] = prior["etag"]
+    r = await gh_client.get(path, params=params, headers=req_headers)
+    if "X-RateLimit-Remaining" in r.headers:
+        gh_rate_limit[workspace_id] = (
+            int(r.headers["X-RateLimit-Remaining"]),
+            int(r.headers.get("X-RateLimit-Reset", 0)),
+        )
+    if r.status_code == 304 and prior:
+        await db["gh_cache"].update_one({"_id": prior["_id"]}, {"$set": {"fetched_at": datetime.now(timezone.utc)}})
+        return 200, prior["body"]
+    if r.status_code >= 300:
+        return r.status_code, r.text
+
+    body = orjson.loads(r.content)
+    if r.headers.get("ETag"):
+        await db["gh_cache"].update_one(
+            {"key": key},
+            {"$set": {"etag": r.headers["ETag"], "body": body, "fetched_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    return r.status_code, body
+
+
+# In-process request coalescing: concurrent callers with the same key and token
+# share one fetch (the token is part of the key so no caller rides on another's credentials)
+gh_inflight = {}
+
+
+async def coalesce(key: str, token: str, fetch):
+    key = (key, token)
+    task = gh_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        gh_inflight[key] = task
+        task.add_done_callback(lambda _: gh_inflight.pop(key, None))
+    # Shield so one caller disconnecting does not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+
+async def b64encode_text(text: str) -> str:
+    if len(text) > B64_THREAD_THRESHOLD:
+        return await asyncio.to_thread(lambda: base64.b64encode(text.encode("utf-8")).decode("utf-8"))
+    return base64.b64encode(text.encode("utf-8")).decode("utf-8")
+
+
+async def b64decode_text(data: str) -> str:
+    if len(data) > B64_THREAD_THRESHOLD:
+        return await asyncio.to_thread(lambda: base64.b64decode(data).decode("utf-8"))
+    return base64.b64decode(data).decode("utf-8")
+
+
+# The Redis cache fails open: errors are logged and treated as a miss / no-op
+async def cache_get(key: str):
+    if redis_client is None:
+        return None
+    try:
+        cached = await redis_client.get(key)
+    except RedisError as e:
+        logger.warning("Redis get %s failed: %s", key, e)
+        return None
+    return orjson.loads(cached) if cached else None
+
+
+async def cache_set(key: str, data, ttl: int = GH_CACHE_TTL):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(key, ttl, orjson.dumps(data))
+    except RedisError as e:
+        logger.warning("Redis set %s failed: %s", key, e)
+
+
+async def cache_delete(key: str):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.delete(key)
+    except RedisError as e:
+        logger.warning("Redis delete %s failed: %s", key, e)
+
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Docs+Git MVP API"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
     }
     try:
-        _ = db.list_collection_names()
+        _ = await db.list_collection_names()
         response["database"] = "✅ Connected"
     except Exception as e:
         response["database"] = f"❌ {str(e)[:120]}"
@@ -61,59 +279,102 @@ def test_database():
 
 # Workspaces
 @app.post("/workspaces")
-def create_workspace(payload: Workspace):
-    ws_id = create_document("workspace", payload)
-    doc = db["workspace"].find_one({"_id": ObjectId(ws_id)})
-    return serialize(doc)
+async def create_workspace(payload: Workspace):
+    ws_id = await create_document("workspace", payload)
+    doc = await db["workspace"].find_one({"_id": ObjectId(ws_id)})
+    return serialize_workspace(doc)
 
 
 @app.get("/workspaces")
-def list_workspaces():
-    items = list(db["workspace"].find().limit(50))
-    return [serialize(x) for x in items]
+async def list_workspaces(response: Response, after: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    # Derive gh_connected server-side so the token never leaves the database
+    pipeline = [
+        {"$match": after_filter(after)},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+        {"$project": {
+            "name": 1,
+            "gh_repo_full_name": 1,
+            "gh_default_branch": 1,
+            "gh_connected": {"$gt": [{"$strLenCP": {"$ifNull": ["$gh_access_token", ""]}}, 0]},
+        }},
+    ]
+    items = await db["workspace"].aggregate(pipeline).to_list(limit)
+    set_next_cursor(response, items, limit)
+    return [serialize_workspace(x) for x in items]
 
 
 # Pages CRUD
 @app.post("/pages")
-def create_page(payload: Page):
+async def create_page(payload: Page):
     # Ensure workspace exists
-    ws = db["workspace"].find_one({"_id": to_object_id(payload.workspace_id)})
+    ws = await db["workspace"].find_one({"_id": to_object_id(payload.workspace_id)})
     if not ws:
         raise HTTPException(status_code=404, detail="Workspace not found")
-    page_id = create_document("page", payload)
-    doc = db["page"].find_one({"_id": ObjectId(page_id)})
-    return serialize(doc)
+    data = payload.model_dump()
+    data["workspace_id"] = ws["_id"]
+    page_id = await create_document("page", data)
+    doc = await db["page"].find_one({"_id": ObjectId(page_id)})
+    return serialize_page(doc)
 
 
 @app.get("/pages")
-def list_pages(workspace_id: str, folder_path: Optional[str] = None):
-    query = {"workspace_id": workspace_id}
+async def list_pages(
+    response: Response,
+    workspace_id: str,
+    folder_path: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=500),
+):
+    query = {"workspace_id": to_object_id(workspace_id), **after_filter(after)}
     if folder_path:
         query["folder_path"] = folder_path
-    items = list(db["page"].find(query).limit(200))
-    return [serialize(x) for x in items]
+    cursor = db["page"].find(query, projection=PAGE_LIST_PROJECTION).sort("_id", 1)
+    items = await cursor.limit(limit).to_list(limit)
+    set_next_cursor(response, items, limit)
+    return [serialize_page(x) for x in items]
 
 
 @app.get("/pages/{page_id}")
-def get_page(page_id: str):
-    doc = db["page"].find_one({"_id": to_object_id(page_id)})
+async def get_page(page_id: str):
+    doc = await db["page"].find_one({"_id": to_object_id(page_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Page not found")
-    return serialize(doc)
+    return serialize_page(doc)
 
 
 @app.patch("/pages/{page_id}")
-def update_page(page_id: str, payload: PageUpdate):
-    update = {k: v for k, v in payload.model_dump(exclude_none=True).items()}
+async def update_page(page_id: str, payload: PageUpdate):
+    update = payload.model_dump(exclude_none=True)
     if not update:
-        return get_page(page_id)
-    db["page"].update_one({"_id": to_object_id(page_id)}, {"$set": update})
-    return get_page(page_id)
+        return await get_page(page_id)
+    doc = await db["page"].find_one_and_update({"_id": to_object_id(page_id)}, {"$set": update}, return_document=ReturnDocument.AFTER)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return serialize_page(doc)
+
+
+# Apply many page updates in one bulk_write round-trip
+@app.post("/pages/bulk")
+async def bulk_update_pages(payload: PageBulkUpdate):
+    ops = []
+    for item in payload.items:
+        update = item.update.model_dump(exclude_none=True)
+        if update:
+            ops.append(UpdateOne({"_id": to_object_id(item.page_id)}, {"$set": update}))
+    if ops:
+        await db["page"].bulk_write(ops, ordered=False)
+    oids = [to_object_id(item.page_id) for item in payload.items]
+    items = await db["page"].find({"_id": {"$in": oids}}).to_list(len(oids))
+    by_id = {x["_id"]: serialize_page(x) for x in items}
+    not_found = {"error": "Page not found", "status_code": 404}
+    # Results follow input order, with a 404 entry for unknown ids
+    return [by_id.get(oid) or {"page_id": str(oid), **not_found} for oid in oids]
 
 
 @app.delete("/pages/{page_id}")
-def delete_page(page_id: str):
-    res = db["page"].delete_one({"_id": to_object_id(page_id)})
+async def delete_page(page_id: str):
+    res = await db["page"].delete_one({"_id": to_object_id(page_id)})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Page not found")
     return {"ok": True}
@@ -121,52 +382,79 @@ def delete_page(page_id: str):
 
 # Simple locks (no realtime) for basic collaboration
 @app.post("/pages/{page_id}/lock")
-def lock_page(page_id: str, payload: LockPayload):
-    db["page"].update_one({"_id": to_object_id(page_id)}, {"$set": {"lock": payload.model_dump()}})
-    return get_page(page_id)
+async def lock_page(page_id: str, payload: LockPayload):
+    doc = await db["page"].find_one_and_update({"_id": to_object_id(page_id)}, {"$set": {"lock": payload.model_dump()}}, return_document=ReturnDocument.AFTER)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return serialize_page(doc)
 
 @app.post("/pages/{page_id}/unlock")
-def unlock_page(page_id: str):
-    db["page"].update_one({"_id": to_object_id(page_id)}, {"$unset": {"lock": ""}})
-    return get_page(page_id)
+async def unlock_page(page_id: str):
+    doc = await db["page"].find_one_and_update({"_id": to_object_id(page_id)}, {"$unset": {"lock": ""}}, return_document=ReturnDocument.AFTER)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return serialize_page(doc)
 
 
 # GitHub OAuth token save (we accept a pre-obtained token for MVP)
 @app.post("/github/connect")
-def github_connect(payload: GitConnect):
+async def github_connect(payload: GitConnect):
     ws_id = to_object_id(payload.workspace_id)
-    db["workspace"].update_one({"_id": ws_id}, {"$set": {"gh_access_token": payload.access_token}})
-    return serialize(db["workspace"].find_one({"_id": ws_id}))
+    await db["workspace"].update_one({"_id": ws_id}, {"$set": {"gh_access_token": payload.access_token}})
+    # Repos visible to the previous token must not be served for the new one
+    await cache_delete(f"gh:{ws_id}:repos")
+    return serialize_workspace(await db["workspace"].find_one({"_id": ws_id}))
 
 
 # List repos for the connected user (MVP)
 @app.get("/github/repos")
-def github_list_repos(workspace_id: str):
-    ws = db["workspace"].find_one({"_id": to_object_id(workspace_id)})
+async def github_list_repos(workspace_id: str):
+    cache_key = f"gh:{to_object_id(workspace_id)}:repos"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return cached
+    ws = await db["workspace"].find_one({"_id": to_object_id(workspace_id)})
     if not ws or not ws.get("gh_access_token"):
         raise HTTPException(status_code=400, detail="GitHub not connected")
-    headers = {"Authorization": f"token {ws['gh_access_token']}", "Accept": "application/vnd.github+json"}
-    r = requests.get("https://api.github.com/user/repos?per_page=100", headers=headers, timeout=20)
-    if r.status_code >= 300:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    data = r.json()
-    return [{"full_name": x["full_name"], "default_branch": x.get("default_branch", "main")} for x in data]
+    headers = gh_headers(ws["gh_access_token"])
+
+    async def fetch():
+        # Page 1 alone covers most accounts; only fan out into concurrent
+        # windows when it comes back full
+        status, data = await gh_get(str(ws["_id"]), "/user/repos", headers, params={"per_page": 100, "page": 1}, allow_stale=True)
+        if status >= 300:
+            raise HTTPException(status_code=status, detail=data)
+        first = 2
+        while len(data) == 100 * (first - 1):
+            results = await asyncio.gather(*(
+                gh_get(str(ws["_id"]), "/user/repos", headers, params={"per_page": 100, "page": p}, allow_stale=True)
+                for p in range(first, first + GH_REPO_PAGE_WINDOW)
+            ))
+            for status, page_data in results:
+                if status >= 300:
+                    raise HTTPException(status_code=status, detail=page_data)
+                data.extend(page_data)
+            first += GH_REPO_PAGE_WINDOW
+        repos = [{"full_name": x["full_name"], "default_branch": x.get("default_branch", "main")} for x in data]
+        await cache_set(cache_key, repos)
+        return repos
+
+    return await coalesce(cache_key, ws["gh_access_token"], fetch)
 
 
 @app.post("/github/select-repo")
-def github_select_repo(payload: GitRepoSelect):
+async def github_select_repo(payload: GitRepoSelect):
     ws_id = to_object_id(payload.workspace_id)
-    db["workspace"].update_one({"_id": ws_id}, {"$set": {"gh_repo_full_name": f"{payload.owner}/{payload.repo}", "gh_default_branch": payload.default_branch}})
-    return serialize(db["workspace"].find_one({"_id": ws_id}))
+    await db["workspace"].update_one({"_id": ws_id}, {"$set": {"gh_repo_full_name": f"{payload.owner}/{payload.repo}", "gh_default_branch": payload.default_branch}})
+    return serialize_workspace(await db["workspace"].find_one({"_id": ws_id}))
 
 
 # Sync a page -> repo path (create or update via GitHub Contents API)
 @app.post("/github/sync-page")
-def github_sync_page(payload: GitSyncPage):
-    page = db["page"].find_one({"_id": to_object_id(payload.page_id)})
+async def github_sync_page(payload: GitSyncPage):
+    page, ws = await find_page_with_workspace(payload.page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
-    ws = db["workspace"].find_one({"_id": to_object_id(page["workspace_id"])})
     if not ws or not ws.get("gh_access_token") or not ws.get("gh_repo_full_name"):
         raise HTTPException(status_code=400, detail="GitHub not configured for workspace")
 
@@ -174,100 +462,175 @@ def github_sync_page(payload: GitSyncPage):
     branch = ws.get("gh_default_branch", "main")
     path = payload.path
 
-    headers = {
-        "Authorization": f"token {ws['gh_access_token']}",
-        "Accept": "application/vnd.github+json"
-    }
-    # Get current file sha if exists
-    get_url = f"https://api.github.com/repos/{owner_repo}/contents/{path}?ref={branch}"
-    sha = None
-    r = requests.get(get_url, headers=headers, timeout=20)
-    if r.status_code == 200:
-        sha = r.json().get("sha")
-
-    content_b64 = base64.b64encode(page.get("content", "").encode("utf-8")).decode("utf-8")
-    put_url = f"https://api.github.com/repos/{owner_repo}/contents/{path}"
+    headers = gh_headers(ws["gh_access_token"])
+    content_b64 = await b64encode_text(page.get("content", ""))
     body = {
         "message": payload.commit_message or "docs: update from workspace",
         "content": content_b64,
         "branch": branch
     }
-    if sha:
-        body["sha"] = sha
-    r = requests.put(put_url, headers=headers, json=body, timeout=20)
+    # Use the blob sha remembered from the last sync/pull of this path; only
+    # probe GitHub for it when the PUT is rejected for a missing/stale sha
+    if page.get("git_path") == path and page.get("git_sha"):
+        body["sha"] = page["git_sha"]
+    async with gh_branch_locks[(owner_repo, branch)]:
+        r = await gh_client.put(f"/repos/{owner_repo}/contents/{path}", headers=headers, json=body)
+        if r.status_code in (409, 422):
+            status, data = await gh_get(str(ws["_id"]), f"/repos/{owner_repo}/contents/{path}", headers, params={"ref": branch})
+            if status == 200 and isinstance(data, dict) and data.get("sha"):
+                body["sha"] = data["sha"]
+                r = await gh_client.put(f"/repos/{owner_repo}/contents/{path}", headers=headers, json=body)
     if r.status_code >= 300:
         raise HTTPException(status_code=r.status_code, detail=r.text)
-
-    # Save git_path mapping on page
-    db["page"].update_one({"_id": page["_id"]}, {"$set": {"git_path": path}})
-    return get_page(str(page["_id"]))
+    git_sha = (orjson.loads(r.content).get("content") or {}).get("sha")
+
+    # Save git_path/sha mapping on page and drop the now-stale history
+    await db["page"].update_one({"_id": page["_id"]}, {"$set": {"git_path": path, "git_sha": git_sha}})
+    await cache_delete(f"gh:{ws['_id']}:history:{owner_repo}:{path}")
+    return await get_page(str(page["_id"]))
+
+
+# Sync many pages; pages in different repos/branches run concurrently, writes to
+# the same branch are serialized by gh_branch_locks. Failures are reported per page
+@app.post("/github/sync-pages")
+async def github_sync_pages(payload: GitSyncPages):
+    results = await asyncio.gather(*(github_sync_page(p) for p in payload.pages), return_exceptions=True)
+    out = []
+    for p, res in zip(payload.pages, results):
+        if isinstance(res, HTTPException):
+            out.append({"page_id": p.page_id, "error": res.detail, "status_code": res.status_code})
+        elif isinstance(res, httpx.HTTPError):
+            out.append({"page_id": p.page_id, "error": str(res) or type(res).__name__, "status_code": 502})
+        elif isinstance(res, Exception):
+            # Don't leak internal error details to the client
+            logger.error("Sync of page %s failed", p.page_id, exc_info=res)
+            out.append({"page_id": p.page_id, "error": "Internal error", "status_code": 500})
+        else:
+            out.append(res)
+    return out
 
 
 # Pull changes from repo -> page content (one file)
 @app.post("/github/pull-page")
-def github_pull_page(payload: GitPullPage):
-    page = db["page"].find_one({"_id": to_object_id(payload.page_id)})
+async def github_pull_page(payload: GitPullPage):
+    page, ws = await find_page_with_workspace(payload.page_id)
     if not page or not page.get("git_path"):
         raise HTTPException(status_code=400, detail="Page not synced to a git path yet")
 
-    ws = db["workspace"].find_one({"_id": to_object_id(page["workspace_id"])})
     if not ws or not ws.get("gh_access_token") or not ws.get("gh_repo_full_name"):
         raise HTTPException(status_code=400, detail="GitHub not configured for workspace")
 
     owner_repo = ws["gh_repo_full_name"]
     branch = ws.get("gh_default_branch", "main")
-    headers = {
-        "Authorization": f"token {ws['gh_access_token']}",
-        "Accept": "application/vnd.github+json"
-    }
-    get_url = f"https://api.github.com/repos/{owner_repo}/contents/{page['git_path']}?ref={branch}"
-    r = requests.get(get_url, headers=headers, timeout=20)
-    if r.status_code >= 300:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    data = r.json()
+    headers = gh_headers(ws["gh_access_token"])
+    status, data = await gh_get(str(ws["_id"]), f"/repos/{owner_repo}/contents/{page['git_path']}", headers, params={"ref": branch})
+    if status >= 300:
+        raise HTTPException(status_code=status, detail=data)
     if data.get("encoding") == "base64" and data.get("content"):
-        content = base64.b64decode(data["content"]).decode("utf-8")
-        db["page"].update_one({"_id": page["_id"]}, {"$set": {"content": content}})
-    return get_page(str(page["_id"]))
+        content = await b64decode_text(data["content"])
+        await db["page"].update_one({"_id": page["_id"]}, {"$set": {"content": content, "git_sha": data.get("sha")}})
+    return await get_page(str(page["_id"]))
+
+
+# Pull many pages: one $in query per collection, concurrent GitHub GETs, one bulk_write
+@app.post("/github/pull-pages")
+async def github_pull_pages(payload: GitPullPages):
+    oids = [to_object_id(x) for x in payload.page_ids]
+    pages = await db["page"].find({"_id": {"$in": oids}}).to_list(len(oids))
+    ws_oids = list({p["workspace_id"] for p in pages})
+    workspaces = {w["_id"]: w for w in await db["workspace"].find({"_id": {"$in": ws_oids}}).to_list(len(ws_oids))}
+
+    async def fetch(page):
+        if not page.get("git_path"):
+            return 400, "Page not synced to a git path yet"
+        ws = workspaces.get(page["workspace_id"])
+        if not ws or not ws.get("gh_access_token") or not ws.get("gh_repo_full_name"):
+            return 400, "GitHub not configured for workspace"
+        headers = gh_headers(ws["gh_access_token"])
+        path = f"/repos/{ws['gh_repo_full_name']}/contents/{page['git_path']}"
+        try:
+            return await gh_get(str(ws["_id"]), path, headers, params={"ref": ws.get("gh_default_branch", "main")})
+        except httpx.HTTPError as e:
+            return 502, str(e) or type(e).__name__
+
+    results = await asyncio.gather(*(fetch(p) for p in pages))
+    ops = []
+    errors = {}
+    for page, (status, data) in zip(pages, results):
+        if status >= 300:
+            errors[page["_id"]] = {"page_id": str(page["_id"]), "error": data, "status_code": status}
+        elif data.get("encoding") == "base64" and data.get("content"):
+            content = await b64decode_text(data["content"])
+            ops.append(UpdateOne({"_id": page["_id"]}, {"$set": {"content": content, "git_sha": data.get("sha")}}))
+    if ops:
+        await db["page"].bulk_write(ops, ordered=False)
+
+    fresh = await db["page"].find({"_id": {"$in": oids}}).to_list(len(oids))
+    by_id = {x["_id"]: serialize_page(x) for x in fresh}
+    not_found = {"error": "Page not found", "status_code": 404}
+    return [errors.get(oid) or by_id.get(oid) or {"page_id": str(oid), **not_found} for oid in oids]
 
 
 # History listing via Git log (GitHub API commits for a path)
 @app.get("/github/history")
-def github_history(workspace_id: str, path: str):
-    ws = db["workspace"].find_one({"_id": to_object_id(workspace_id)})
+async def github_history(workspace_id: str, path: str):
+    ws = await db["workspace"].find_one({"_id": to_object_id(workspace_id)})
     if not ws or not ws.get("gh_access_token") or not ws.get("gh_repo_full_name"):
         raise HTTPException(status_code=400, detail="GitHub not configured for workspace")
-    headers = {"Authorization": f"token {ws['gh_access_token']}", "Accept": "application/vnd.github+json"}
+    headers = gh_headers(ws["gh_access_token"])
     owner_repo = ws["gh_repo_full_name"]
-    r = requests.get(f"https://api.github.com/repos/{owner_repo}/commits", params={"path": path, "per_page": 50}, headers=headers, timeout=20)
-    if r.status_code >= 300:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    data = r.json()
-    # Return compact info
-    return [
-        {
-            "sha": x.get("sha"),
-            "author": (x.get("commit", {}).get("author", {}) or {}).get("name"),
-            "date": (x.get("commit", {}).get("author", {}) or {}).get("date"),
-            "message": (x.get("commit", {}) or {}).get("message"),
-            "url": x.get("html_url"),
-        }
-        for x in data
-    ]
-
-
-# Search (simple full text using regex on title/content/tags)
+    cache_key = f"gh:{ws['_id']}:history:{owner_repo}:{path}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    async def fetch():
+        status, data = await gh_get(str(ws["_id"]), f"/repos/{owner_repo}/commits", headers, params={"path": path, "per_page": 50}, allow_stale=True)
+        if status >= 300:
+            raise HTTPException(status_code=status, detail=data)
+        # Return compact info
+        history = [
+            {
+                "sha": x.get("sha"),
+                "author": (x.get("commit", {}).get("author", {}) or {}).get("name"),
+                "date": (x.get("commit", {}).get("author", {}) or {}).get("date"),
+                "message": (x.get("commit", {}) or {}).get("message"),
+                "url": x.get("html_url"),
+            }
+            for x in data
+        ]
+        await cache_set(cache_key, history)
+        return history
+
+    return await coalesce(cache_key, ws["gh_access_token"], fetch)
+
+
+# Search (full text over title/content/tags via the text index)
 @app.get("/search")
-def search(workspace_id: str, q: str):
+async def search(workspace_id: str, q: str = Query(..., min_length=1, max_length=SEARCH_MAX_LEN), limit: int = Query(50, ge=1, le=200)):
+    ws_id = to_object_id(workspace_id)
     try:
-        regex = {"$regex": q, "$options": "i"}
-        items = list(db["page"].find({"workspace_id": workspace_id, "$or": [{"title": regex}, {"content": regex}, {"tags": regex}]}).limit(50))
-        return [serialize(x) for x in items]
+        cursor = db["page"].find({"workspace_id": ws_id, "$text": {"$search": q}}, projection=PAGE_LIST_PROJECTION)
+        items = await cursor.sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+        return [serialize_page(x) for x in items]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Title/tag autocompletion: starts-with match served from the collated indexes
+@app.get("/search/prefix")
+async def search_prefix(workspace_id: str, q: str = Query(..., min_length=1, max_length=SEARCH_MAX_LEN)):
+    # U+FFFF sorts after every other character under ICU collation, so this
+    # range is exactly "starts with q", case-insensitively. $elemMatch makes a
+    # single tag satisfy both bounds instead of any two tags of the array
+    prefix = {"$gte": q, "$lt": q + "\uffff"}
+    query = {"workspace_id": to_object_id(workspace_id), "$or": [{"title": prefix}, {"tags": {"$elemMatch": prefix}}]}
+    items = await db["page"].find(query, projection=PAGE_LIST_PROJECTION, collation=CI_COLLATION).limit(20).to_list(20)
+    return [serialize_page(x) for x in items]
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)
@@ -0,0 +1,37 @@
+"""
+One-off migration: store page.workspace_id as an ObjectId
+
+Pages created before workspace_id was persisted as an ObjectId hold it as a
+hex string. Run once per database after deploying:
+
+    python migrate_workspace_ids.py
+
+Strings that are not valid ObjectIds are left untouched and reported.
+"""
+
+import asyncio
+
+from database import db
+
+
+async def main():
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    res = await db["page"].update_many(
+        {"workspace_id": {"$type": "string"}},
+        [{"$set": {"workspace_id": {"$convert": {
+            "input": "$workspace_id",
+            "to": "objectId",
+            "onError": "$workspace_id",
+        }}}}],
+    )
+    print(f"Converted {res.modified_count} page(s)")
+
+    leftover = await db["page"].count_documents({"workspace_id": {"$type": "string"}})
+    if leftover:
+        print(f"{leftover} page(s) have a workspace_id that is not a valid ObjectId")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
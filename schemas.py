@@ -21,7 +21,7 @@ class Page(BaseModel):
     content: str = Field("", description="Markdown content")
     folder_path: str = Field("/", description="Path-like folder, e.g. /docs/specs")
     tags: List[str] = Field(default_factory=list)
-    workspace_id: str = Field(..., description="Workspace this page belongs to")
+    workspace_id: str = Field(..., description="Workspace this page belongs to (stored as ObjectId)")
     # GitHub mapping (optional until synced)
     git_path: Optional[str] = Field(None, description="Path in the repo, e.g. docs/specs/page.md")
 
@@ -32,6 +32,13 @@ class PageUpdate(BaseModel):
     tags: Optional[List[str]] = None
     git_path: Optional[str] = None
 
+class PageBulkUpdateItem(BaseModel):
+    page_id: str
+    update: PageUpdate
+
+class PageBulkUpdate(BaseModel):
+    items: List[PageBulkUpdateItem] = Field(..., max_length=500)
+
 class GitConnect(BaseModel):
     workspace_id: str
     access_token: str
@@ -47,9 +54,15 @@ class GitSyncPage(BaseModel):
     path: str  # repo path for the file
     commit_message: Optional[str] = "docs: update from workspace"
 
+class GitSyncPages(BaseModel):
+    pages: List[GitSyncPage] = Field(..., max_length=50)
+
 class GitPullPage(BaseModel):
     page_id: str
 
+class GitPullPages(BaseModel):
+    page_ids: List[str] = Field(..., max_length=50)
+
 class SearchQuery(BaseModel):
     workspace_id: str
     q: str